@@ -6,9 +6,46 @@ Demonstrates collaborative agents solving the "what to watch" problem
 
 import asyncio
 import json
-from datetime import datetime
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
 from typing import Dict, List, Any
 
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Stage delays only stand in for real I/O; SIMULATE_LATENCY=0 skips them
+# (same flag as the enhanced system)
+SIMULATE_LATENCY = os.getenv("SIMULATE_LATENCY", "1") == "1"
+
+# Columnar layout for the analysis pass, holding only the columns it reads;
+# genre is an object column so names of any length are kept whole
+SHOW_DTYPE = np.dtype([
+    ("genre", "O"),
+    ("rating", "f4"),
+])
+
+
+@dataclass(slots=True, frozen=True)
+class Show:
+    """A candidate title on one platform"""
+    title: str
+    genre: str
+    rating: float
+    platform: str
+
+
+def _top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest values, highest first, ties in original order"""
+    if k >= len(values):
+        return np.argsort(-values, kind="stable")
+    kth = np.partition(values, -k)[-k]  # O(N) selection of the cut-off value
+    candidates = np.flatnonzero(values >= kth)
+    return candidates[np.argsort(-values[candidates], kind="stable")][:k]
+
 
 class Agent:
     """Base Agent class"""
@@ -19,12 +56,11 @@ class Agent:
 
     def log(self, message: str):
         """Log agent activity"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f"[{timestamp}] 🤖 {self.name} ({self.role}): {message}")
+        logger.info("🤖 %s (%s): %s", self.name, self.role, message)
 
     def remember(self, key: str, value: Any):
         """Store information in memory"""
-        self.memory.append({"key": key, "value": value, "timestamp": datetime.now()})
+        self.memory.append({"key": key, "value": value, "timestamp": time.time()})
 
     async def execute(self, task: str) -> Dict[str, Any]:
         """Execute agent task - to be overridden"""
@@ -34,32 +70,46 @@ class Agent:
 class ResearchAgent(Agent):
     """Agent that researches user preferences and content availability"""
 
+    # Simulated per-platform catalogs
+    CATALOGS = {
+        "netflix": [
+            {"title": "Stranger Things", "genre": "sci-fi", "rating": 8.7},
+            {"title": "The Crown", "genre": "drama", "rating": 8.6},
+            {"title": "Arcane", "genre": "animation", "rating": 9.0}
+        ],
+        "disney_plus": [
+            {"title": "The Mandalorian", "genre": "sci-fi", "rating": 8.7},
+            {"title": "Loki", "genre": "sci-fi", "rating": 8.2}
+        ],
+        "hbo_max": [
+            {"title": "House of the Dragon", "genre": "fantasy", "rating": 8.5},
+            {"title": "The Last of Us", "genre": "drama", "rating": 8.8}
+        ]
+    }
+
     def __init__(self):
         super().__init__("ResearchBot", "Content Research")
 
+    async def _fetch_platform(self, platform: str) -> List[Show]:
+        """Fetch one platform's catalog"""
+        # Simulate research delay
+        if SIMULATE_LATENCY:
+            await asyncio.sleep(1)
+        # Genres and platforms repeat across titles, so share one copy of each string
+        platform = sys.intern(platform)
+        return [
+            Show(show["title"], sys.intern(show["genre"]), show["rating"], platform)
+            for show in self.CATALOGS[platform]
+        ]
+
     async def execute(self, task: str) -> Dict[str, Any]:
         """Research content based on user preferences"""
         self.log(f"Researching: {task}")
 
-        # Simulate research delay
-        await asyncio.sleep(1)
-
-        # Simulate finding content across platforms
-        results = {
-            "netflix": [
-                {"title": "Stranger Things", "genre": "sci-fi", "rating": 8.7},
-                {"title": "The Crown", "genre": "drama", "rating": 8.6},
-                {"title": "Arcane", "genre": "animation", "rating": 9.0}
-            ],
-            "disney_plus": [
-                {"title": "The Mandalorian", "genre": "sci-fi", "rating": 8.7},
-                {"title": "Loki", "genre": "sci-fi", "rating": 8.2}
-            ],
-            "hbo_max": [
-                {"title": "House of the Dragon", "genre": "fantasy", "rating": 8.5},
-                {"title": "The Last of Us", "genre": "drama", "rating": 8.8}
-            ]
-        }
+        # Query every platform at once; total wait is the slowest platform
+        platforms = list(self.CATALOGS)
+        catalogs = await asyncio.gather(*(self._fetch_platform(p) for p in platforms))
+        results = dict(zip(platforms, catalogs))
 
         self.remember("research_results", results)
         self.log(f"Found {sum(len(v) for v in results.values())} shows across {len(results)} platforms")
@@ -82,34 +132,35 @@ class AnalysisAgent(Agent):
         self.log("Analyzing content and matching preferences...")
 
         # Simulate analysis delay
-        await asyncio.sleep(1)
+        if SIMULATE_LATENCY:
+            await asyncio.sleep(1)
 
-        # Extract all shows
-        all_shows = []
+        # Extract all shows into one structured array
         data = research_data.get("data", {})
-        for platform, shows in data.items():
-            for show in shows:
-                show["platform"] = platform
-                all_shows.append(show)
+        all_shows = [show for shows in data.values() for show in shows]
+        arr = np.array(
+            [(show.genre, show.rating) for show in all_shows],
+            dtype=SHOW_DTYPE
+        )
 
-        # Sort by rating
-        ranked = sorted(all_shows, key=lambda x: x["rating"], reverse=True)
+        # Only the top picks are used, so select them instead of sorting everything
+        top_recommendations = [all_shows[i] for i in _top_k(arr["rating"], 3).tolist()]
 
-        # Analyze patterns
-        genres = {}
-        for show in all_shows:
-            genre = show["genre"]
-            genres[genre] = genres.get(genre, 0) + 1
+        # Analyze patterns, listing genres in order of first appearance
+        names, first, counts = np.unique(arr["genre"], return_index=True, return_counts=True)
+        order = np.argsort(first)
+        genres = dict(zip(names[order].tolist(), counts[order].tolist()))
 
         analysis = {
-            "top_recommendations": ranked[:3],
-            "total_analyzed": len(all_shows),
+            "top_recommendations": top_recommendations,
+            "total_analyzed": len(arr),
             "genre_distribution": genres,
-            "average_rating": sum(s["rating"] for s in all_shows) / len(all_shows)
+            "average_rating": float(arr["rating"].mean(dtype=np.float64))
         }
 
         self.remember("analysis", analysis)
-        self.log(f"Analyzed {len(all_shows)} shows, top pick: {ranked[0]['title']} ({ranked[0]['rating']}/10)")
+        best = top_recommendations[0]
+        self.log(f"Analyzed {len(arr)} shows, top pick: {best.title} ({best.rating}/10)")
 
         return {
             "status": "success",
@@ -129,7 +180,8 @@ class RecommendationAgent(Agent):
         self.log("Generating personalized recommendations...")
 
         # Simulate processing delay
-        await asyncio.sleep(1)
+        if SIMULATE_LATENCY:
+            await asyncio.sleep(1)
 
         data = analysis_data.get("data", {})
         top_picks = data.get("top_recommendations", [])
@@ -138,10 +190,10 @@ class RecommendationAgent(Agent):
         for i, show in enumerate(top_picks, 1):
             rec = {
                 "rank": i,
-                "title": show["title"],
-                "platform": show["platform"],
-                "genre": show["genre"],
-                "rating": show["rating"],
+                "title": show.title,
+                "platform": show.platform,
+                "genre": show.genre,
+                "rating": show.rating,
                 "reason": self._generate_reason(show, data)
             }
             recommendations.append(rec)
@@ -162,12 +214,12 @@ class RecommendationAgent(Agent):
             "agent": self.name
         }
 
-    def _generate_reason(self, show: Dict, analysis: Dict) -> str:
+    def _generate_reason(self, show: Show, analysis: Dict) -> str:
         """Generate recommendation reason"""
         reasons = [
-            f"Highly rated at {show['rating']}/10",
-            f"Popular {show['genre']} genre",
-            f"Available on {show['platform'].replace('_', ' ').title()}"
+            f"Highly rated at {show.rating}/10",
+            f"Popular {show.genre} genre",
+            f"Available on {show.platform.replace('_', ' ').title()}"
         ]
         return " • ".join(reasons)
 
@@ -175,6 +227,14 @@ class RecommendationAgent(Agent):
 class CoordinatorAgent(Agent):
     """Coordinator agent that orchestrates the multi-agent workflow"""
 
+    # Stage -> stages it depends on; a stage runs as soon as all its deps finish
+    # and its agent receives their results as arguments, in this order
+    STAGES = {
+        "research": [],
+        "analysis": ["research"],
+        "recommendation": ["analysis"]
+    }
+
     def __init__(self):
         super().__init__("Coordinator", "Workflow Orchestration")
         self.agents = {
@@ -190,17 +250,8 @@ class CoordinatorAgent(Agent):
         self.log("=" * 60)
 
         try:
-            # Step 1: Research
-            self.log("Step 1: Delegating to Research Agent")
-            research_result = await self.agents["research"].execute(user_query)
-
-            # Step 2: Analysis
-            self.log("\nStep 2: Delegating to Analysis Agent")
-            analysis_result = await self.agents["analysis"].execute(research_result)
-
-            # Step 3: Recommendations
-            self.log("\nStep 3: Delegating to Recommendation Agent")
-            recommendation_result = await self.agents["recommendation"].execute(analysis_result)
+            results = await self._run_stages(user_query)
+            recommendation_result = results["recommendation"]
 
             # Final summary
             self.log("\n" + "=" * 60)
@@ -211,11 +262,7 @@ class CoordinatorAgent(Agent):
                 "status": "success",
                 "query": user_query,
                 "results": recommendation_result["data"],
-                "agents_involved": [
-                    self.agents["research"].name,
-                    self.agents["analysis"].name,
-                    self.agents["recommendation"].name
-                ]
+                "agents_involved": [agent.name for agent in self.agents.values()]
             }
 
         except Exception as e:
@@ -225,6 +272,31 @@ class CoordinatorAgent(Agent):
                 "error": str(e)
             }
 
+    async def _run_stages(self, user_query: str) -> Dict[str, Dict[str, Any]]:
+        """Launch each stage once its dependencies are done, running ready stages concurrently"""
+        results: Dict[str, Dict[str, Any]] = {}
+        waiting = dict(self.STAGES)
+        running: Dict[asyncio.Task, str] = {}
+
+        while waiting or running:
+            for stage, deps in list(waiting.items()):
+                if all(dep in results for dep in deps):
+                    # Root stages take the query; others take one positional
+                    # argument per dependency, in the order the deps are listed
+                    inputs = [results[dep] for dep in deps] if deps else [user_query]
+                    self.log(f"Delegating {stage} to {self.agents[stage].name}")
+                    running[asyncio.create_task(self.agents[stage].execute(*inputs))] = stage
+                    del waiting[stage]
+
+            if not running:
+                raise RuntimeError(f"Unsatisfiable stage dependencies: {sorted(waiting)}")
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[running.pop(task)] = task.result()
+
+        return results
+
 
 def display_recommendations(result: Dict[str, Any]):
     """Display recommendations in a user-friendly format"""
@@ -262,6 +334,10 @@ async def main():
     print("\n🚀 MULTI-AGENT ENTERTAINMENT DISCOVERY SYSTEM")
     print("Solving the '45-minute decision problem'\n")
 
+    # Agent activity goes through logging; show it as timestamped lines
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s",
+                        datefmt="%H:%M:%S", stream=sys.stdout)
+
     # Create coordinator
     coordinator = CoordinatorAgent()
 
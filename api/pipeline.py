@@ -0,0 +1,64 @@
+"""
+Stage-parallel request pipeline
+Each stage has its own workers and queue, so request N+1 can be researched
+while request N is being analyzed
+"""
+
+import asyncio
+from typing import Any, Callable, List, Optional, Sequence
+
+
+class StagePipeline:
+    """Run requests through a fixed sequence of stages, one worker pool per stage"""
+
+    def __init__(self, stages: Sequence[str], agent_factory: Callable[[], Any],
+                 workers_per_stage: int = 1, maxsize: int = 0):
+        # Agents must provide `await run_stage(stage, state) -> state`
+        self.stages = tuple(stages)
+        self.agent_factory = agent_factory
+        self.workers_per_stage = workers_per_stage
+        # One queue in front of every stage; bounded queues give backpressure
+        self._queues: List[asyncio.Queue] = [asyncio.Queue(maxsize) for _ in self.stages]
+        self._workers: List[asyncio.Task] = []
+
+    def start(self):
+        """Spawn the stage workers (call from a running event loop)"""
+        if self._workers:
+            return
+        for i, stage in enumerate(self.stages):
+            for _ in range(self.workers_per_stage):
+                self._workers.append(asyncio.create_task(self._stage_worker(i, stage, self.agent_factory())))
+
+    async def stop(self):
+        """Cancel all stage workers"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def submit(self, state: Any) -> Any:
+        """Feed a request into the first stage and wait for the last stage's output"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queues[0].put((state, future))
+        return await future
+
+    async def _stage_worker(self, index: int, stage: str, agent: Any):
+        """Take items off this stage's queue, run the stage and pass results on"""
+        in_q = self._queues[index]
+        out_q: Optional[asyncio.Queue] = self._queues[index + 1] if index + 1 < len(self._queues) else None
+        while True:
+            state, future = await in_q.get()
+            if future.cancelled():
+                continue
+            try:
+                state = await agent.run_stage(stage, state)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+
+            if out_q is None:
+                if not future.done():
+                    future.set_result(state)
+            else:
+                await out_q.put((state, future))